@@ -1,17 +1,42 @@
 """A client of mysql."""
 
-from logging import INFO, getLogger
+import json
+import re
+from datetime import datetime
+from datetime import timedelta
+from logging import DEBUG, INFO, getLogger
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import Any
 from typing import Dict
+from typing import FrozenSet
 from typing import Generator
 from typing import List
+from typing import Sequence
+from typing import Tuple
 
 import mysql.connector
+from apache_beam.options.value_provider import ValueProvider
+from mysql.connector import HAVE_CEXT
 from mysql.connector.errors import Error as MySQLConnectorError
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
 
 from beam_mysql.connector.errors import MySQLClientError
 
 _SELECT_STATEMENT = "SELECT"
 _INSERT_STATEMENT = "INSERT"
+_LEADING_WHITESPACE = re.compile(r"\s*")
+_DATA_SIZE = re.compile(r"^(\d+(?:\.\d+)?)([KMGTPE]?)$")
+
+# every pool opens all of its connections up front, and a worker keeps one pool per kind of connection
+_POOL_SIZE = 2
+_FETCH_SIZE = 1000
+_DEFAULT_ROW_SIZE = 100
+
+# Connection pools shared by every client on the worker, keyed by the connection config and pool size.
+_pools: Dict[Tuple[FrozenSet, int], MySQLConnectionPool] = {}
+_pools_lock = Lock()
 
 logger = getLogger(__name__)
 logger.setLevel(INFO)
@@ -20,9 +45,15 @@ logger.setLevel(INFO)
 class MySQLClient:
     """A mysql client object."""
 
-    def __init__(self, config: Dict):
-        self._config = config
-        self._validate_config(self._config)
+    def __init__(
+        self, config: Dict, fetch_size: int = _FETCH_SIZE, local_infile: bool = False, pool_size: int = _POOL_SIZE
+    ):
+        # the config is validated once by the transforms, see `validate_config`
+        # load data local infile has to be allowed on the connection to use bulk_loader
+        self._config = {**config, "allow_local_infile": True} if local_infile else config
+        self._fetch_size = fetch_size
+        self._pool_size = pool_size
+        self._explained_tables: Dict[str, Dict] = {}
 
     def record_generator(self, query: str, dictionary=True) -> Generator[Dict, None, None]:
         """
@@ -40,7 +71,7 @@ class MySQLClient:
         """
         self._validate_query(query, [_SELECT_STATEMENT])
 
-        with _MySQLConnection(self._config) as conn:
+        with _MySQLConnection(self._config, pool_size=self._pool_size) as conn:
             # buffered is false because it can be assumed that the data size is too large
             cur = conn.cursor(buffered=False, dictionary=dictionary)
 
@@ -48,8 +79,12 @@ class MySQLClient:
                 cur.execute(query)
                 logger.info(f"Successfully execute query: {query}")
 
-                for record in cur:
-                    yield record
+                # fetch rows in chunks to avoid a round trip through the cursor per row
+                while True:
+                    records = cur.fetchmany(self._fetch_size)
+                    if not records:
+                        break
+                    yield from records
             except MySQLConnectorError as e:
                 raise MySQLClientError(f"Failed to execute query: {query}, Raise exception: {e}")
 
@@ -71,7 +106,7 @@ class MySQLClient:
         self._validate_query(query, [_SELECT_STATEMENT])
         count_query = f"SELECT COUNT(*) AS count FROM ({query}) as subq"
 
-        with _MySQLConnection(self._config) as conn:
+        with _MySQLConnection(self._config, pool_size=self._pool_size) as conn:
             # buffered is false because it can be assumed that the data size is too large
             cur = conn.cursor(buffered=False, dictionary=True)
 
@@ -101,55 +136,151 @@ class MySQLClient:
         Raises:
             ~beam_mysql.connector.errors.MySQLClientError
         """
-        self._validate_query(query, [_SELECT_STATEMENT])
-        count_query = f"EXPLAIN SELECT * FROM ({query}) as subq"
+        table = self._explain_result_table(query)
+        total_number = int(table.get("rows_produced_per_join", table.get("rows_examined_per_scan", 0)))
 
-        with _MySQLConnection(self._config) as conn:
-            # buffered is false because it can be assumed that the data size is too large
-            cur = conn.cursor(buffered=False, dictionary=True)
+        if total_number <= 0:
+            raise mysql.connector.errors.Error(f"Failed to estimate total number of records. Query: {query}")
 
-            try:
-                cur.execute(count_query)
-                logger.info(f"Successfully execute query: {count_query}")
+        return total_number
 
-                records = cur.fetchall()
+    def rough_row_size_estimator(self, query: str) -> int:
+        """
+        Make a rough estimate of the average size of a record in bytes.
+
+        Args:
+            query: query with select statement
+
+        Returns:
+            the average size of a record
+
+        Raises:
+            ~beam_mysql.connector.errors.MySQLClientError
+        """
+        table = self._explain_result_table(query)
+        total_number = int(table.get("rows_produced_per_join", 0))
+        data_size = self._parse_data_size(table.get("cost_info", {}).get("data_read_per_join"))
+
+        if total_number <= 0 or data_size <= 0:
+            return _DEFAULT_ROW_SIZE
+
+        return max(1, data_size // total_number)
+
+    def primary_key_columns(self, table: str) -> List[str]:
+        """
+        Get the columns of the primary key of the table.
+
+        Args:
+            table: table name
+
+        Returns:
+            the column names in the order of the primary key
+
+        Raises:
+            ~beam_mysql.connector.errors.MySQLClientError
+        """
+        query = f"SHOW KEYS FROM {table} WHERE Key_name = 'PRIMARY'"
+
+        with _MySQLConnection(self._config, pool_size=self._pool_size) as conn:
+            cur = conn.cursor(dictionary=True)
 
-                total_number = 0
+            try:
+                cur.execute(query)
+                logger.info(f"Successfully execute query: {query}")
 
-                for record in records:
-                    # Query of the argument should be "DERIVED" because it is sub query of explain select.
-                    # Count query should be "PRIMARY" or "SIMPLE" because it is not sub query.
-                    if record["select_type"] in ("PRIMARY", "SIMPLE"):
-                        total_number = record["rows"]
+                records = cur.fetchall()
             except MySQLConnectorError as e:
-                raise MySQLClientError(f"Failed to execute query: {count_query}, Raise exception: {e}")
+                raise MySQLClientError(f"Failed to execute query: {query}, Raise exception: {e}")
 
             cur.close()
 
-            if total_number <= 0:
-                raise mysql.connector.errors.Error(f"Failed to estimate total number of records. Query: {count_query}")
-            else:
-                return total_number
+        return [record["Column_name"] for record in sorted(records, key=lambda record: record["Seq_in_index"])]
+
+    def record_loader(self, query: str, parameters: List):
+        """
+        Load records into mysql in one transaction.
+        The connector rewrites an insert statement into one multi-row insert for the whole batch.
+
+        Args:
+            query: query with insert statement and a placeholder for each column
+            parameters: the values of each record
+
+        Raises:
+            ~beam_mysql.connector.errors.MySQLClientError
+        """
+        with _MySQLConnection(self._config, autocommit=False, pool_size=self._pool_size) as conn:
+            cur = conn.cursor()
+
+            try:
+                self.execute_batch(cur, query, parameters)
+            except MySQLClientError:
+                conn.rollback()
+                raise
+
+            cur.close()
+            self.commit(conn)
 
-    def record_loader(self, query: str, parameters):
+    def execute_batch(self, cur, query: str, parameters: List):
         """
-        Load dict record into mysql.
+        Load records into mysql on a cursor which is kept open across batches.
+        The caller commits the transaction of the cursor's connection.
+        The multi-row statement of each batch is logged at debug level, which is shown after
+        `logging.getLogger("beam_mysql.connector.client").setLevel(logging.DEBUG)`.
 
         Args:
-            query: query with insert or update statement
+            cur: cursor of a connection opened by `connect`
+            query: query with insert statement and a placeholder for each column
+            parameters: the values of each record
 
         Raises:
             ~beam_mysql.connector.errors.MySQLClientError
         """
         self._validate_query(query, [_INSERT_STATEMENT])
 
-        with _MySQLConnection(self._config) as conn:
+        try:
+            cur.executemany(query, parameters)
+            if logger.isEnabledFor(DEBUG):
+                # the statement is the single multi-row insert the connector rewrote the batch into
+                logger.debug(f"Successfully load {cur.rowcount} records with statement: {cur.statement[:200]}")
+        except MySQLConnectorError as e:
+            raise MySQLClientError(f"Failed to execute query: {query}, Raise exception: {e}")
+
+    def bulk_loader(self, table: str, columns: Sequence[str], parameters: List, conn):
+        """
+        Load records into mysql with load data local infile, which is much faster than insert for large batches.
+        The client has to be created with local_infile and the server has to enable local_infile.
+
+        Args:
+            table: table name to load records into
+            columns: column names in the order of the values
+            parameters: the values of each record
+            conn: connection opened by `connect`, the caller commits the transaction
+
+        Raises:
+            ~beam_mysql.connector.errors.MySQLClientError
+        """
+        with NamedTemporaryFile("w", encoding="utf-8", newline="", suffix=".csv") as f:
+            for values in parameters:
+                f.write(",".join([self._to_infile_field(value) for value in values]))
+                f.write("\n")
+            f.flush()
+
+            column_str = ", ".join(columns)
+            query = (
+                f"LOAD DATA LOCAL INFILE '{f.name}' INTO TABLE {table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY ',' ENCLOSED BY '\"' ESCAPED BY '' LINES TERMINATED BY '\\n' ({column_str})"
+            )
+
             cur = conn.cursor()
 
             try:
-                cur.executemany(query, parameters)
-                conn.commit()
-                # logger.info(f"Successfully execute query: {query}")
+                cur.execute(query)
+                # load data local turns duplicate keys and bad values into warnings instead of errors
+                if cur.warning_count:
+                    cur.execute("SHOW WARNINGS LIMIT 10")
+                    warnings = cur.fetchall()
+                    conn.rollback()
+                    raise MySQLClientError(f"Failed to load records without warnings: {query}, Warnings: {warnings}")
             except MySQLConnectorError as e:
                 conn.rollback()
                 raise MySQLClientError(f"Failed to execute query: {query}, Raise exception: {e}")
@@ -157,32 +288,225 @@ class MySQLClient:
             cur.close()
 
     @staticmethod
-    def _validate_config(config: Dict):
+    def can_bulk_load(parameters: List) -> bool:
+        """
+        Check that the records can be written into the text file of `bulk_loader`.
+        Binary values can not, so such records have to be loaded by insert.
+
+        Args:
+            parameters: the values of each record
+        """
+        return not any(isinstance(value, (bytes, bytearray)) for values in parameters for value in values)
+
+    def connect(self):
+        """
+        Open a connection to load records in one transaction.
+        The caller has to commit or rollback and then close it.
+
+        Raises:
+            ~beam_mysql.connector.errors.MySQLClientError
+        """
+        return _MySQLConnection(self._config, autocommit=False, pool_size=self._pool_size).open()
+
+    @staticmethod
+    def commit(conn):
+        """
+        Commit the transaction of the connection, or roll it back if the commit fails.
+
+        Raises:
+            ~beam_mysql.connector.errors.MySQLClientError
+        """
+        try:
+            conn.commit()
+        except MySQLConnectorError as e:
+            conn.rollback()
+            raise MySQLClientError(f"Failed to commit, Raise exception: {e}")
+
+    def _explain_result_table(self, query: str) -> Dict:
+        # the plan is cached as it is used by several estimates of the same query
+        if query in self._explained_tables:
+            return self._explained_tables[query]
+
+        self._validate_query(query, [_SELECT_STATEMENT])
+        explain_query = f"EXPLAIN FORMAT=JSON {query}"
+
+        with _MySQLConnection(self._config, pool_size=self._pool_size) as conn:
+            cur = conn.cursor()
+
+            try:
+                cur.execute(explain_query)
+                logger.info(f"Successfully execute query: {explain_query}")
+
+                record = cur.fetchone()
+            except MySQLConnectorError as e:
+                raise MySQLClientError(f"Failed to execute query: {explain_query}, Raise exception: {e}")
+
+            cur.close()
+
+        table = self._find_result_table(json.loads(record[0])["query_block"])
+        self._explained_tables[query] = table
+        return table
+
+    @staticmethod
+    def _parse_data_size(data_size) -> int:
+        # explain format=json shows sizes like "512", "1K" or "2.5M"
+        match = _DATA_SIZE.match(str(data_size)) if data_size is not None else None
+        if not match:
+            return 0
+        return int(float(match.group(1)) * 1024 ** " KMGTPE".index(match.group(2) or " "))
+
+    @staticmethod
+    def _to_infile_field(value: Any) -> str:
+        # with an empty escape character, only an unenclosed NULL is read as null
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            value = int(value)
+        elif isinstance(value, datetime):
+            value = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        elif isinstance(value, timedelta):
+            # the same time format as the connector writes for insert, e.g. "-25:00:00.500000"
+            sign = "-" if value < timedelta(0) else ""
+            seconds, microseconds = divmod(abs(value) // timedelta(microseconds=1), 1000000)
+            minutes, seconds = divmod(seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+            value = f"{sign}{hours:02d}:{minutes:02d}:{seconds:02d}" + (f".{microseconds:06d}" if microseconds else "")
+        return '"' + str(value).replace('"', '""') + '"'
+
+    @classmethod
+    def _find_result_table(cls, node) -> Dict:
+        """Find the table which produces the result rows in the output of explain format=json."""
+        if isinstance(node, dict):
+            if "nested_loop" in node:
+                # the rows produced by the last table of a join are the rows of the result
+                return cls._find_result_table(node["nested_loop"][-1])
+            if "table" in node:
+                return node["table"]
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            return {}
+
+        for child in children:
+            table = cls._find_result_table(child)
+            if table:
+                return table
+        return {}
+
+    @classmethod
+    def _get_pool(cls, config: Dict, pool_size: int = _POOL_SIZE) -> MySQLConnectionPool:
+        """
+        Get the connection pool for the config, creating it on first use.
+
+        The pool lives for the whole worker process, so connections are reused across bundles
+        instead of paying the connect and auth handshake every time.
+        """
+        key = (frozenset(config.items()), pool_size)
+
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = MySQLConnectionPool(
+                    pool_name=f"beam_mysql_{len(_pools)}", pool_size=pool_size, pool_reset_session=False, **config
+                )
+                _pools[key] = pool
+
+        return pool
+
+    @staticmethod
+    def validate_config(config: Dict):
+        """
+        Validate the config of mysql connection.
+        Values given as ValueProvider are resolved on runtime, so only their presence is checked.
+        Keys other than the required ones are allowed and passed to the connection as they are.
+
+        Args:
+            config: config of mysql connection
+
+        Raises:
+            ~beam_mysql.connector.errors.MySQLClientError
+        """
         required_keys = {"host", "port", "database", "user", "password"}
-        if not config.keys() == required_keys:
-            raise MySQLClientError(f"Config is not satisfied. required: {required_keys}, actual: {config.keys()}")
+        missing_keys = {key for key in required_keys if config.get(key) is None}
+        if missing_keys:
+            raise MySQLClientError(f"Config is not satisfied. missing: {missing_keys}, actual: {config.keys()}")
+
+        port = config["port"]
+        if not isinstance(port, ValueProvider):
+            # mysql connector casts the port by int, so a numeric string like "3306" is accepted as well
+            try:
+                int(port)
+            except (TypeError, ValueError):
+                raise MySQLClientError(f"Config is not satisfied. port must be an integer, actual: {port!r}")
 
     @staticmethod
     def _validate_query(query: str, statements: List[str]):
-        query = query.lstrip()
+        # only the head of the query is compared, as an insert query can be very large
+        start = _LEADING_WHITESPACE.match(query).end()
 
         for statement in statements:
-            if statement and not query.lower().startswith(statement.lower()):
+            if statement and query[start : start + len(statement)].upper() != statement.upper():
                 raise MySQLClientError(f"Query expected to start with {statement} statement. Query: {query}")
 
 
 class _MySQLConnection:
     """A wrapper object to connect mysql."""
 
-    def __init__(self, _config: Dict):
-        self._config = _config
+    def __init__(self, _config: Dict, autocommit: bool = True, pool_size: int = _POOL_SIZE):
+        # loading connections disable autocommit and commit a batch or bundle as one transaction, while
+        # reading connections keep it so that no transaction stays open on a connection back in the pool.
+        # rows are converted by the C extension when it is installed instead of in pure python.
+        # the connector refuses use_pure=False without the extension, so pure python is kept then.
+        self._config = {**_config, "autocommit": autocommit, "use_pure": not HAVE_CEXT}
+        self._pool_size = pool_size
 
     def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    def open(self):
         try:
-            self.conn = mysql.connector.connect(**self._config)
+            pool = MySQLClient._get_pool(self._config, self._pool_size)
+            try:
+                self.conn = pool.get_connection()
+                self._pool = pool
+            except PoolError:
+                # All pooled connections are in use, so fall back to a dedicated one.
+                self.conn = mysql.connector.connect(**self._config)
+                self._pool = None
             return self.conn
         except MySQLConnectorError as e:
             raise MySQLClientError(f"Failed to connect mysql, Raise exception: {e}")
 
-    def __exit__(self, exception_type, exception_value, traceback):
-        self.conn.close()
+    def close(self):
+        if not self.conn.unread_result:
+            # Returns the connection to the pool if it is a pooled one.
+            self.conn.close()
+            return
+
+        # Rows are left unread (e.g. a generator abandoned after a dynamic split). Stop the query on the server
+        # and drop the connection instead of draining the rest of the result, and replace it in the pool.
+        self._kill_query(self.conn.connection_id)
+        try:
+            self.conn.disconnect()
+        except MySQLConnectorError:
+            pass  # The connection is dropped anyway.
+
+        if self._pool is not None:
+            try:
+                self._pool.add_connection()
+            except MySQLConnectorError as e:
+                logger.warning(f"Failed to replace a dropped connection in the pool, Raise exception: {e}")
+
+    def _kill_query(self, connection_id: int):
+        try:
+            with _MySQLConnection(self._config, pool_size=self._pool_size) as conn:
+                cur = conn.cursor()
+                cur.execute(f"KILL QUERY {connection_id}")
+                cur.close()
+        except (MySQLClientError, MySQLConnectorError) as e:
+            # Disconnecting still works, it only has to read the rest of the result.
+            logger.warning(f"Failed to kill query of connection {connection_id}, Raise exception: {e}")
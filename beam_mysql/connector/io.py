@@ -1,6 +1,13 @@
 """I/O connectors of mysql."""
 
+from logging import getLogger
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Callable
 from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import Union
 
 import apache_beam as beam
@@ -8,12 +15,15 @@ from apache_beam.io import iobase
 from apache_beam.options.value_provider import ValueProvider
 from apache_beam.pvalue import PCollection
 from apache_beam.transforms.core import PTransform
+from mysql.connector.errors import Error as MySQLConnectorError
 
 from beam_mysql.connector import splitters
 from beam_mysql.connector.client import MySQLClient
 from beam_mysql.connector.source import MySQLSource
 from beam_mysql.connector.utils import get_runtime_value
 
+logger = getLogger(__name__)
+
 
 class ReadFromMySQL(PTransform):
     """Create PCollection from MySQL."""
@@ -27,8 +37,13 @@ class ReadFromMySQL(PTransform):
         password: Union[str, ValueProvider],
         port: Union[int, ValueProvider] = 3306,
         splitter=splitters.NoSplitter(),
+        pool_size: int = 2,
+        fetch_size: int = 1000,
     ):
         super().__init__()
+        MySQLClient.validate_config(
+            {"host": host, "database": database, "user": user, "password": password, "port": port}
+        )
         self._query = query
         self._host = host
         self._database = database
@@ -36,10 +51,22 @@ class ReadFromMySQL(PTransform):
         self._password = password
         self._port = port
         self._splitter = splitter
+        self._pool_size = pool_size
+        self._fetch_size = fetch_size
 
     def expand(self, pcoll: PCollection) -> PCollection:
         return pcoll | iobase.Read(
-            MySQLSource(self._query, self._host, self._database, self._user, self._password, self._port, self._splitter)
+            MySQLSource(
+                self._query,
+                self._host,
+                self._database,
+                self._user,
+                self._password,
+                self._port,
+                self._splitter,
+                self._pool_size,
+                self._fetch_size,
+            )
         )
 
 
@@ -55,9 +82,19 @@ class WriteToMySQL(PTransform):
         password: Union[str, ValueProvider],
         port: Union[int, ValueProvider] = 3306,
         batch_size: int = 1000,
-        do_upsert: bool = False
+        do_upsert: bool = False,
+        bulk_load_threshold: Optional[int] = None,
+        pool_size: int = 2,
     ):
         super().__init__()
+        MySQLClient.validate_config(
+            {"host": host, "database": database, "user": user, "password": password, "port": port}
+        )
+        if bulk_load_threshold is not None and bulk_load_threshold > batch_size:
+            # a batch never grows beyond batch_size, so it would never be bulk loaded
+            raise ValueError(
+                f"bulk_load_threshold must not exceed batch_size: {bulk_load_threshold} > {batch_size}"
+            )
         self._host = host
         self._database = database
         self._table = table
@@ -66,11 +103,22 @@ class WriteToMySQL(PTransform):
         self._port = port
         self._batch_size = batch_size
         self.do_upsert = do_upsert
+        self._bulk_load_threshold = bulk_load_threshold
+        self._pool_size = pool_size
 
     def expand(self, pcoll: PCollection) -> PCollection:
         return pcoll | beam.ParDo(
             _WriteToMySQLFn(
-                self._host, self._database, self._table, self._user, self._password, self._port, self._batch_size, self.do_upsert
+                self._host,
+                self._database,
+                self._table,
+                self._user,
+                self._password,
+                self._port,
+                self._batch_size,
+                self.do_upsert,
+                self._bulk_load_threshold,
+                self._pool_size,
             )
         )
 
@@ -87,7 +135,9 @@ class _WriteToMySQLFn(beam.DoFn):
         password: Union[str, ValueProvider],
         port: Union[int, ValueProvider],
         batch_size: int,
-        do_upsert: bool=False
+        do_upsert: bool=False,
+        bulk_load_threshold: Optional[int] = None,
+        pool_size: int = 2,
     ):
         super().__init__()
         self._host = host
@@ -106,45 +156,143 @@ class _WriteToMySQLFn(beam.DoFn):
             "port": self._port,
         }
         self.do_upsert = do_upsert
+        self._resolved = False
+        # batches with at least this many rows are loaded by load data local infile, disabled if None
+        self._bulk_load_threshold = bulk_load_threshold
+        self._pool_size = pool_size
 
-    def start_bundle(self):
+    def setup(self):
         self._build_value()
-        self._values_batch = []
+        # statements by column tuple, kept for the lifetime of the DoFn so stable schemas build one statement.
+        # they are not server-side prepared: a prepared cursor runs executemany row by row
+        # instead of as one multi-row insert.
+        self._queries: Dict[Tuple[str, ...], str] = {}
+        self._conn = None
+        self._cursor = None
+
+    def start_bundle(self):
+        # the batch buffer is allocated once per bundle and its slots are overwritten by each batch
+        self._values_batch = [None] * max(1, self._batch_size)
+        self._n = 0
+        self._keys = None
+        self._columns = None
+        self._get_values = None
+        self._query = None
+        # the whole bundle is loaded in one transaction
+        self._discard_connection()
+        self._conn = self._client.connect()
+        # one cursor serves every batch of the bundle
+        self._cursor = self._conn.cursor()
 
     def process(self, element: Dict, *args, **kwargs):
-        columns = []
-        values = []
-        for column, value in element.items():
-            columns.append(column)
-            values.append(value)
+        keys = tuple(element.keys())
+        if keys != self._keys:
+            self._keys = keys
+            # columns are sorted so that the statement text is the same whatever the key order of the rows is
+            columns = tuple(sorted(keys))
+            if columns != self._columns:
+                # all rows of a batch are loaded by one multi-row statement, so they must share columns
+                self._flush()
+                self._columns = columns
+                self._query = self._build_query(columns)
+                self._get_values = self._build_values_getter(columns)
+
+        # tuples are smaller than lists and the values line up with the cached columns
+        self._values_batch[self._n] = self._get_values(element)
+        self._n += 1
+
+        if self._n >= self._batch_size:
+            self._flush()
+
+    def finish_bundle(self):
+        try:
+            self._flush()
+            self._client.commit(self._conn)
+        except Exception:
+            # rows of the failed bundle must not stay pending on the connection when it goes back to the pool
+            self._discard_connection()
+            raise
+
+        self._close_connection()
+
+    def teardown(self):
+        self._discard_connection()
+
+    def _flush(self):
+        if not self._n:
+            return
+
+        values_batch = self._values_batch if self._n == len(self._values_batch) else self._values_batch[: self._n]
+        if self._use_bulk_load(values_batch):
+            table = f"{self._config['database']}.{self._table}"
+            self._client.bulk_loader(table, self._columns, values_batch, self._conn)
+        else:
+            self._client.execute_batch(self._cursor, self._query, values_batch)
+        self._n = 0
+
+    def _use_bulk_load(self, values_batch: List[Tuple]) -> bool:
+        # load data can not update existing rows, so upserts always go through insert
+        return (
+            self._bulk_load_threshold is not None
+            and not self.do_upsert
+            and len(values_batch) >= self._bulk_load_threshold
+            and self._client.can_bulk_load(values_batch)
+        )
+
+    def _discard_connection(self):
+        # a connection is left over when a bundle failed, its transaction is rolled back before release
+        if self._conn is not None:
+            try:
+                self._conn.rollback()
+            except MySQLConnectorError as e:
+                # the connection may be broken, which is often why the bundle failed
+                logger.warning(f"Failed to rollback a discarded connection, Raise exception: {e}")
+            finally:
+                self._close_connection()
+
+    def _close_connection(self):
+        try:
+            if self._cursor is not None:
+                self._cursor.close()
+            self._conn.close()
+        except MySQLConnectorError as e:
+            logger.warning(f"Failed to close a connection, Raise exception: {e}")
+        finally:
+            self._cursor = None
+            self._conn = None
+
+    @staticmethod
+    def _build_values_getter(columns: Tuple[str, ...]) -> Callable[[Dict], Tuple]:
+        if len(columns) == 1:
+            column = columns[0]
+            return lambda element: (element[column],)
+        # itemgetter of several keys returns their values as a tuple
+        return itemgetter(*columns)
+
+    def _build_query(self, columns: Tuple[str, ...]) -> str:
+        query = self._queries.get(columns)
+        if query is not None:
+            return query
 
         column_str = ", ".join(columns)
-        value_str = '%s' + (',%s' * (len(values)-1))
+        value_str = ", ".join(["%s"] * len(columns))
 
         query = f"INSERT INTO {self._config['database']}.{self._table} ({column_str}) VALUES ({value_str})"
-        self.query = query
         if self.do_upsert:
-            update_str = ", ".join(
-                [f"{column} = VALUES({column})" for column in columns]
-            )
-            query += f" ON DUPLICATE KEY UPDATE {update_str};"
-            self.query = query
-
-        self._values_batch.append(values)
+            update_str = ", ".join([f"{column} = VALUES({column})" for column in columns])
+            query += f" ON DUPLICATE KEY UPDATE {update_str}"
 
-        if len(self._values_batch) >= self._batch_size:
-            self._client.record_loader(query, self._values_batch)
-            self._values_batch.clear()
-
-    def finish_bundle(self):
-        if len(self._values_batch):
-            self._client.record_loader(self.query, self._values_batch)
-            self._values_batch.clear()
+        self._queries[columns] = query
+        return query
 
     def _build_value(self):
-        for k, v in self._config.items():
-            self._config[k] = get_runtime_value(v)
-        self._table = get_runtime_value(self._table)
-        self._batch_size = get_runtime_value(self._batch_size)
+        # value providers are resolved only once, even if setup runs again on the same instance
+        if not self._resolved:
+            self._config = MappingProxyType({k: get_runtime_value(v) for k, v in self._config.items()})
+            self._table = get_runtime_value(self._table)
+            self._batch_size = get_runtime_value(self._batch_size)
+            self._resolved = True
 
-        self._client = MySQLClient(self._config)
+        self._client = MySQLClient(
+            self._config, local_infile=self._bulk_load_threshold is not None, pool_size=self._pool_size
+        )
@@ -23,6 +23,8 @@ class MySQLSource(iobase.BoundedSource):
         password: Union[str, ValueProvider],
         port: Union[int, ValueProvider],
         splitter: splitters.BaseSplitter,
+        pool_size: int = 2,
+        fetch_size: int = 1000,
     ):
         super().__init__()
         self._query = query
@@ -43,6 +45,8 @@ class MySQLSource(iobase.BoundedSource):
         }
 
         self._splitter = splitter
+        self._pool_size = pool_size
+        self._fetch_size = fetch_size
 
     def estimate_size(self):
         """Implement :class:`~apache_beam.io.iobase.BoundedSource.estimate_size`"""
@@ -76,7 +80,7 @@ class MySQLSource(iobase.BoundedSource):
             self._config[k] = get_runtime_value(v)
 
         self.query = cleanse_query(get_runtime_value(self._query))
-        self.client = MySQLClient(self._config)
+        self.client = MySQLClient(self._config, fetch_size=self._fetch_size, pool_size=self._pool_size)
         self._splitter.build_source(self)
 
         self._is_builded = True
@@ -4,8 +4,10 @@ import re
 from abc import ABCMeta
 from abc import abstractmethod
 from datetime import datetime
+from typing import Any
 from typing import Callable
 from typing import Iterator
+from typing import Optional
 
 from apache_beam.io import iobase
 from apache_beam.io.range_trackers import LexicographicKeyRangeTracker
@@ -40,6 +42,14 @@ class BaseSplitter(metaclass=ABCMeta):
         """Wrap :class:`~apache_beam.io.iobase.BoundedSource.split`"""
         raise NotImplementedError()
 
+    def _rows_per_bundle(self, desired_bundle_size: int, batch_size: Optional[int]) -> int:
+        """Get the number of records of a bundle, following the desired bundle size of beam in bytes."""
+        if batch_size is not None:
+            return batch_size
+
+        row_size = self.source.client.rough_row_size_estimator(self.source.query)
+        return max(1, desired_bundle_size // row_size)
+
 
 class NoSplitter(BaseSplitter):
     """No split bounded source so not work parallel."""
@@ -73,13 +83,14 @@ class NoSplitter(BaseSplitter):
 class LimitOffsetSplitter(BaseSplitter):
     """Split bounded source by limit and offset."""
 
-    def __init__(self, batch_size: int = 1000000):
+    def __init__(self, batch_size: Optional[int] = None):
+        # the records of a bundle, derived from the desired bundle size of beam if None
         self._batch_size = batch_size
         self._counts = 0
 
     def estimate_size(self):
         self._counts = self.source.client.counts_estimator(self.source.query)
-        return self._counts
+        return self._counts * self.source.client.rough_row_size_estimator(self.source.query)
 
     def get_range_tracker(self, start_position, stop_position):
         if self._counts == 0:
@@ -89,13 +100,21 @@ class LimitOffsetSplitter(BaseSplitter):
         if stop_position is None:
             stop_position = self._counts
 
-        return LexicographicKeyRangeTracker(start_position, stop_position)
+        return OffsetRangeTracker(start_position, stop_position)
 
     def read(self, range_tracker):
-        offset, limit = range_tracker.start_position(), range_tracker.stop_position()
-        query = f"SELECT * FROM ({self.source.query}) as subq LIMIT {limit} OFFSET {offset}"
-        for record in self.source.client.record_generator(query):
-            yield record
+        offset, stop = range_tracker.start_position(), range_tracker.stop_position()
+        query = f"SELECT * FROM ({self.source.query}) as subq LIMIT {stop - offset} OFFSET {offset}"
+
+        records = self.source.client.record_generator(query)
+        try:
+            # each record claims its offset, so the rest of the range can be split off to another worker
+            for position, record in enumerate(records, start=offset):
+                if not range_tracker.try_claim(position):
+                    return
+                yield record
+        finally:
+            records.close()
 
     def split(self, desired_bundle_size, start_position=None, stop_position=None):
         if self._counts == 0:
@@ -105,19 +124,107 @@ class LimitOffsetSplitter(BaseSplitter):
         if stop_position is None:
             stop_position = self._counts
 
-        last_position = 0
-        for offset in range(start_position, stop_position, self._batch_size):
+        batch_size = self._rows_per_bundle(desired_bundle_size, self._batch_size)
+
+        # each bundle covers the offsets [start, stop) so it reads only its own rows
+        for offset in range(start_position, stop_position, batch_size):
             yield iobase.SourceBundle(
-                weight=desired_bundle_size, source=self.source, start_position=offset, stop_position=self._batch_size
+                weight=desired_bundle_size,
+                source=self.source,
+                start_position=offset,
+                stop_position=min(offset + batch_size, stop_position),
             )
-            last_position = offset + self._batch_size
 
-        yield iobase.SourceBundle(
-            weight=desired_bundle_size,
-            source=self.source,
-            start_position=last_position + 1,
-            stop_position=stop_position,
-        )
+
+class KeysetSplitter(BaseSplitter):
+    """Split bounded source by ranges of a unique key, so each bundle only scans its own range on the index."""
+
+    PATTERN = r"^\s*SELECT\s+.+?\s+FROM\s+([\w.`]+)\s*(?:WHERE\s+.*)?$"
+    # the key ranges of bundles only cover the rows of the table when the query just filters them
+    UNSUPPORTED_CLAUSES = r"\b(?:LIMIT|GROUP\s+BY|HAVING|ORDER\s+BY|UNION)\b"
+
+    def __init__(self, pk_column: Optional[str] = None, batch_size: Optional[int] = None):
+        self._pk_column = pk_column
+        # the records of a bundle, derived from the desired bundle size of beam if None
+        self._batch_size = batch_size
+
+    def build_source(self, source):
+        super().build_source(source)
+        if self._pk_column is None:
+            self._pk_column = self._detect_pk_column()
+
+    def estimate_size(self):
+        counts = self.source.client.rough_counts_estimator(self.source.query)
+        return counts * self.source.client.rough_row_size_estimator(self.source.query)
+
+    def get_range_tracker(self, start_position, stop_position):
+        # read does not claim positions, so the range must not be split dynamically
+        return UnsplittableRangeTracker(LexicographicKeyRangeTracker(start_position, stop_position))
+
+    def read(self, range_tracker):
+        conditions = []
+        if range_tracker.start_position() is not None:
+            conditions.append(f"{self._pk_column} >= {self._to_literal(range_tracker.start_position())}")
+        if range_tracker.stop_position() is not None:
+            conditions.append(f"{self._pk_column} < {self._to_literal(range_tracker.stop_position())}")
+
+        query = f"SELECT * FROM ({self.source.query}) as subq"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        for record in self.source.client.record_generator(query):
+            yield record
+
+    def split(self, desired_bundle_size, start_position=None, stop_position=None):
+        batch_size = self._rows_per_bundle(desired_bundle_size, self._batch_size)
+
+        lower = start_position
+        while True:
+            upper = self._next_boundary(lower, batch_size)
+            if upper is not None and lower is not None and upper <= lower:
+                # more than batch_size records share the key, so the range could never move forward
+                raise ValueError(f"Require a unique 'pk_column': {self._pk_column} repeats the value {lower}")
+            if upper is None or (stop_position is not None and upper >= stop_position):
+                upper = stop_position
+
+            yield iobase.SourceBundle(
+                weight=desired_bundle_size, source=self.source, start_position=lower, stop_position=upper
+            )
+
+            if upper == stop_position:
+                break
+            lower = upper
+
+    def _next_boundary(self, lower: Any, batch_size: int) -> Any:
+        # skip batch_size keys from the lower boundary on the index instead of from the first row
+        query = f"SELECT {self._pk_column} AS pk FROM ({self.source.query}) as subq"
+        if lower is not None:
+            query += f" WHERE {self._pk_column} >= {self._to_literal(lower)}"
+        query += f" ORDER BY {self._pk_column} LIMIT 1 OFFSET {batch_size}"
+        records = list(self.source.client.record_generator(query))
+        return records[0]["pk"] if records else None
+
+    def _detect_pk_column(self) -> str:
+        match = re.match(self.PATTERN, self.source.query, re.IGNORECASE | re.DOTALL)
+        if not match or re.search(self.UNSUPPORTED_CLAUSES, self.source.query, re.IGNORECASE):
+            example = "SELECT * FROM tests WHERE date >= '2020-01-01'"
+            raise ValueError(f"Require 'pk_column' or a simple query on one table: {self.source.query}, e.g. '{example}'")
+
+        table = match.group(1)
+        pk_columns = self.source.client.primary_key_columns(table)
+        if len(pk_columns) != 1:
+            raise ValueError(f"Require 'pk_column' as the primary key of {table} is not a single column: {pk_columns}")
+
+        return pk_columns[0]
+
+    @staticmethod
+    def _to_literal(value: Any) -> str:
+        if isinstance(value, int):
+            return str(value)
+        if isinstance(value, (bytes, bytearray)):
+            return f"X'{value.hex()}'"
+        escaped = str(value).replace("\\", "\\\\").replace("'", "''")
+        return f"'{escaped}'"
 
 
 class IdsSplitter(BaseSplitter):
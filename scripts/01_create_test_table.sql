@@ -15,4 +15,13 @@ PARTITION BY RANGE COLUMNS(date) (
     PARTITION p202004 VALUES LESS THAN ('2020-05-01') ENGINE = InnoDB,
     PARTITION p202005 VALUES LESS THAN ('2020-06-01') ENGINE = InnoDB,
     PARTITION p202006 VALUES LESS THAN ('2020-07-01') ENGINE = InnoDB
-);
\ No newline at end of file
+);
+
+DROP TABLE IF EXISTS `keyset_tests`;
+
+CREATE TABLE IF NOT EXISTS `keyset_tests`
+(
+  `id`               INT(20) AUTO_INCREMENT,
+  `name`             VARCHAR(20) NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_bin;
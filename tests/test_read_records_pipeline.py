@@ -6,7 +6,11 @@ from apache_beam.testing.util import equal_to
 from datetime import date
 
 from beam_mysql.connector import splitters
+from beam_mysql.connector.client import MySQLClient
+from beam_mysql.connector.client import _MySQLConnection
+from beam_mysql.connector.errors import MySQLClientError
 from beam_mysql.connector.io import ReadFromMySQL
+from beam_mysql.connector.source import MySQLSource
 from tests.test_base import TestBase
 
 
@@ -61,6 +65,68 @@ class TestReadRecordsPipeline(TestBase):
 
             assert_that(actual, equal_to(expected))
 
+    def test_pipeline_keyset_splitter(self):
+        expected = [
+            {"id": 1, "name": "test data1", "date": date(2020, 1, 1), "memo": "memo1"},
+            {"id": 2, "name": "test data2", "date": date(2020, 2, 2), "memo": None},
+            {"id": 3, "name": "test data3", "date": date(2020, 3, 3), "memo": "memo3"},
+            {"id": 4, "name": "test data4", "date": date(2020, 4, 4), "memo": None},
+            {"id": 5, "name": "test data5", "date": date(2020, 5, 5), "memo": None},
+        ]
+
+        with TestPipeline() as p:
+            # Access to mysql on docker
+            read_from_mysql = ReadFromMySQL(
+                query="SELECT * FROM test_db.tests;",
+                host="0.0.0.0",
+                database="test_db",
+                user="root",
+                password="root",
+                port=3307,
+                splitter=splitters.KeysetSplitter(pk_column="id", batch_size=2),
+            )
+
+            actual = p | read_from_mysql
+
+            assert_that(actual, equal_to(expected))
+
+    def test_pipeline_keyset_splitter_detected_pk(self):
+        expected = [
+            {"id": 1, "name": "test data1"},
+            {"id": 2, "name": "test data2"},
+            {"id": 3, "name": "test data3"},
+        ]
+
+        with TestPipeline() as p:
+            # Access to mysql on docker
+            read_from_mysql = ReadFromMySQL(
+                query="SELECT * FROM test_db.keyset_tests;",
+                host="0.0.0.0",
+                database="test_db",
+                user="root",
+                password="root",
+                port=3307,
+                splitter=splitters.KeysetSplitter(batch_size=2),
+            )
+
+            actual = p | read_from_mysql
+
+            assert_that(actual, equal_to(expected))
+
+    def test_keyset_splitter_rejected_query(self):
+        queries = [
+            "SELECT * FROM test_db.keyset_tests WHERE id > 0 LIMIT 2;",
+            "SELECT name FROM test_db.keyset_tests WHERE id > 0 GROUP BY name;",
+            "SELECT * FROM test_db.keyset_tests WHERE id > 0 ORDER BY name;",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                source = MySQLSource(
+                    query, "0.0.0.0", "test_db", "root", "root", 3307, splitters.KeysetSplitter(batch_size=2)
+                )
+                with self.assertRaises(ValueError):
+                    list(source.split(1))
+
     def test_pipeline_ids_splitter(self):
         expected = [
             {"id": 1, "name": "test data1", "date": date(2020, 1, 1), "memo": "memo1"},
@@ -127,3 +193,53 @@ class TestReadRecordsPipeline(TestBase):
             actual = p | read_from_mysql
 
             assert_that(actual, equal_to(expected))
+
+    def test_abandoned_read(self):
+        config = {"host": "0.0.0.0", "database": "test_db", "user": "root", "password": "root", "port": 3307}
+        # one row per fetch and one pooled connection, so rows are left unread and the pool has to be refilled
+        client = MySQLClient(config, fetch_size=1, pool_size=1)
+
+        records = client.record_generator("SELECT * FROM test_db.tests ORDER BY id")
+        self.assertEqual(next(records)["id"], 1)
+        records.close()
+
+        # the dropped connection is replaced, so the pool still hands out a working one instead of raising PoolError
+        pool = MySQLClient._get_pool(_MySQLConnection(config)._config, pool_size=1)
+        conn = pool.get_connection()
+        self.assertTrue(conn.is_connected())
+        conn.close()
+
+        for _ in range(2):
+            actual = list(client.record_generator("SELECT id FROM test_db.tests ORDER BY id"))
+            self.assertEqual(actual, [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 4}, {"id": 5}])
+
+    def test_invalid_config(self):
+        with self.assertRaises(MySQLClientError):
+            ReadFromMySQL(
+                query="SELECT * FROM test_db.tests;",
+                host=None,
+                database="test_db",
+                user="root",
+                password="root",
+                port=3307,
+            )
+
+        with self.assertRaises(MySQLClientError):
+            ReadFromMySQL(
+                query="SELECT * FROM test_db.tests;",
+                host="0.0.0.0",
+                database="test_db",
+                user="root",
+                password="root",
+                port="not a port",
+            )
+
+        # ports read from arguments or environment variables are strings
+        ReadFromMySQL(
+            query="SELECT * FROM test_db.tests;",
+            host="0.0.0.0",
+            database="test_db",
+            user="root",
+            password="root",
+            port="3307",
+        )
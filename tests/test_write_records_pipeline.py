@@ -16,6 +16,14 @@ PASSWORD = "root"
 PORT = 3307
 BATCH_SIZE = 0
 
+INITIAL_RECORDS = [
+    {"id": 1, "name": "test data1", "date": datetime.date(2020, 1, 1), "memo": "memo1"},
+    {"id": 2, "name": "test data2", "date": datetime.date(2020, 2, 2), "memo": None},
+    {"id": 3, "name": "test data3", "date": datetime.date(2020, 3, 3), "memo": "memo3"},
+    {"id": 4, "name": "test data4", "date": datetime.date(2020, 4, 4), "memo": None},
+    {"id": 5, "name": "test data5", "date": datetime.date(2020, 5, 5), "memo": None},
+]
+
 
 class TestWriteRecordsPipeline(TestBase):
     def setUp(self):
@@ -30,38 +38,149 @@ class TestWriteRecordsPipeline(TestBase):
 
     def tearDown(self):
         cur = self.conn.cursor()
-        cur.execute(f"DELETE FROM {DATABASE}.{TABLE} WHERE id = 6;")
+        cur.execute(f"DELETE FROM {DATABASE}.{TABLE} WHERE id >= 6;")
+        cur.execute(f"UPDATE {DATABASE}.{TABLE} SET name = 'test data1', memo = 'memo1' WHERE id = 1;")
         cur.close()
         self.conn.commit()
         self.conn.close()
 
     def test_pipeline(self):
-        expected = [
-            {"id": 1, "name": "test data1", "date": datetime.date(2020, 1, 1), "memo": "memo1"},
-            {"id": 2, "name": "test data2", "date": datetime.date(2020, 2, 2), "memo": None},
-            {"id": 3, "name": "test data3", "date": datetime.date(2020, 3, 3), "memo": "memo3"},
-            {"id": 4, "name": "test data4", "date": datetime.date(2020, 4, 4), "memo": None},
-            {"id": 5, "name": "test data5", "date": datetime.date(2020, 5, 5), "memo": None},
+        expected = INITIAL_RECORDS + [
             {"id": 6, "name": "test data6", "date": datetime.date(2020, 6, 6), "memo": None},
         ]
 
-        with TestPipeline() as p:
-            # Access to mysql on docker
-            write_to_mysql = WriteToMySQL(
+        self._write([{"id": 6, "name": "test data6", "date": "2020-06-06", "memo": None}], batch_size=BATCH_SIZE)
+
+        self.assertEqual(self._read(), expected)
+
+    def test_pipeline_failed_bundle(self):
+        # the second record conflicts with an existing primary key, so the whole bundle fails
+        with self.assertRaises(Exception):
+            self._write(
+                [
+                    {"id": 6, "name": "test data6", "date": "2020-06-06", "memo": None},
+                    {"id": 1, "name": "test data1", "date": "2020-01-01", "memo": "memo1"},
+                ],
+                batch_size=1,
+            )
+
+        self.assertEqual(self._read(), INITIAL_RECORDS)
+
+    def test_pipeline_bulk_load(self):
+        expected = INITIAL_RECORDS + [
+            {"id": 6, "name": 'test "data6"', "date": datetime.date(2020, 6, 6), "memo": None},
+            {"id": 7, "name": "test data7", "date": datetime.date(2020, 6, 7), "memo": 'memo, "7"'},
+        ]
+
+        self._write(
+            [
+                {"id": 6, "name": 'test "data6"', "date": "2020-06-06", "memo": None},
+                {"id": 7, "name": "test data7", "date": "2020-06-07", "memo": 'memo, "7"'},
+            ],
+            batch_size=1,
+            bulk_load_threshold=1,
+        )
+
+        self.assertEqual(self._read(), expected)
+
+    def test_bulk_load_threshold_over_batch_size(self):
+        with self.assertRaises(ValueError):
+            WriteToMySQL(
                 host=HOST,
                 database=DATABASE,
                 table=TABLE,
                 user=USER,
                 password=PASSWORD,
                 port=PORT,
-                batch_size=BATCH_SIZE,
+                batch_size=1000,
+                bulk_load_threshold=10000,
+            )
+
+    def test_pipeline_reordered_keys(self):
+        # records with the same columns in another key order share one batch
+        expected = INITIAL_RECORDS + [
+            {"id": 6, "name": "test data6", "date": datetime.date(2020, 6, 6), "memo": "memo6"},
+            {"id": 7, "name": "test data7", "date": datetime.date(2020, 6, 7), "memo": None},
+        ]
+
+        self._write(
+            [
+                {"id": 6, "name": "test data6", "date": "2020-06-06", "memo": "memo6"},
+                {"memo": None, "date": "2020-06-07", "name": "test data7", "id": 7},
+            ],
+            batch_size=10,
+        )
+
+        self.assertEqual(self._read(), expected)
+
+    def test_pipeline_reordered_keys_upsert(self):
+        expected = [
+            {"id": 1, "name": "test data1", "date": datetime.date(2020, 1, 1), "memo": "updated memo1"},
+            *INITIAL_RECORDS[1:],
+            {"id": 6, "name": "test data6", "date": datetime.date(2020, 6, 6), "memo": "memo6"},
+        ]
+
+        self._write(
+            [
+                {"id": 6, "name": "test data6", "date": "2020-06-06", "memo": "memo6"},
+                {"memo": "updated memo1", "date": "2020-01-01", "name": "test data1", "id": 1},
+            ],
+            batch_size=10,
+            do_upsert=True,
+        )
+
+        self.assertEqual(self._read(), expected)
+
+    def test_pipeline_changed_columns(self):
+        # a record with other columns flushes the pending batch and starts a new statement
+        expected = INITIAL_RECORDS + [
+            {"id": 6, "name": "test data6", "date": datetime.date(2020, 6, 6), "memo": "memo6"},
+            {"id": 7, "name": "test data7", "date": datetime.date(2020, 6, 7), "memo": None},
+        ]
+
+        self._write(
+            [
+                {"id": 6, "name": "test data6", "date": "2020-06-06", "memo": "memo6"},
+                {"id": 7, "name": "test data7", "date": "2020-06-07"},
+            ],
+            batch_size=10,
+        )
+
+        self.assertEqual(self._read(), expected)
+
+    def test_pipeline_changed_columns_upsert(self):
+        # the upsert of a record with other columns only updates its own columns
+        expected = [
+            {"id": 1, "name": "updated data1", "date": datetime.date(2020, 1, 1), "memo": "memo1"},
+            *INITIAL_RECORDS[1:],
+            {"id": 6, "name": "test data6", "date": datetime.date(2020, 6, 6), "memo": "memo6"},
+            {"id": 7, "name": "test data7", "date": datetime.date(2020, 6, 7), "memo": None},
+        ]
+
+        self._write(
+            [
+                {"id": 6, "name": "test data6", "date": "2020-06-06", "memo": "memo6"},
+                {"id": 1, "name": "updated data1", "date": "2020-01-01"},
+                {"id": 7, "name": "test data7", "date": "2020-06-07"},
+            ],
+            batch_size=10,
+            do_upsert=True,
+        )
+
+        self.assertEqual(self._read(), expected)
+
+    def _write(self, records, **kwargs):
+        with TestPipeline() as p:
+            # Access to mysql on docker
+            write_to_mysql = WriteToMySQL(
+                host=HOST, database=DATABASE, table=TABLE, user=USER, password=PASSWORD, port=PORT, **kwargs
             )
 
-            (p | beam.Create([{"id": 6, "name": "test data6", "date": "2020-06-06", "memo": None}]) | write_to_mysql)
+            (p | beam.Create(records) | write_to_mysql)
 
+    def _read(self):
         cur = self.conn.cursor(dictionary=True)
         cur.execute(f"SELECT * FROM {DATABASE}.{TABLE}")
         actual = cur.fetchall()
         cur.close()
-
-        self.assertEqual(actual, expected)
+        return actual